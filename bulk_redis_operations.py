@@ -7,67 +7,146 @@ Loads thousands of records and shows query patterns
 import redis
 import json
 import time
+import itertools
+from collections import defaultdict
 from faker import Faker
-import random
+import numpy as np
+
+from redis_client import get_client
 
 fake = Faker()
 
-def connect_to_redis():
-    """Connect to Redis server"""
-    try:
-        r = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-        r.ping()
-        print("✅ Connected to Redis successfully!")
-        return r
-    except redis.ConnectionError:
-        print("❌ Could not connect to Redis. Make sure it's running on localhost:6379")
-        return None
+# Lua script that performs all per-user writes in one server-side call
+# (HSET + 2x SADD + 2x ZADD + HINCRBY), so Redis parses one command
+# instead of six
+USER_INSERT_LUA = """
+redis.call('HSET', KEYS[1], unpack(ARGV, 5))
+redis.call('SADD', KEYS[2], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[1])
+redis.call('ZADD', KEYS[4], ARGV[2], ARGV[1])
+redis.call('ZADD', KEYS[5], ARGV[3], ARGV[1])
+redis.call('HINCRBY', KEYS[6], ARGV[4], 1)
+return 1
+"""
+
+def connect_to_redis(verify=False):
+    """Get a pooled Redis client; verify=True forces an upfront PING"""
+    r = get_client()
+    if verify:
+        try:
+            r.ping()
+            print("✅ Connected to Redis successfully!")
+        except redis.ConnectionError:
+            print("❌ Could not connect to Redis. Make sure it's running on localhost:6379")
+            return None
+    return r
 
 def generate_sample_users(count=1000):
     """Generate sample user data"""
-    users = []
     cities = ["New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio", "San Diego", "Dallas", "San Jose"]
     departments = ["Engineering", "Sales", "Marketing", "HR", "Finance", "Operations", "Support"]
-    
+
+    # Faker calls are the dominant cost at large counts - build bounded
+    # pools once and sample them with replacement instead of calling
+    # fake.* per row
+    pool_size = min(count, 10000)
+    name_pool = [fake.name() for _ in range(pool_size)]
+    email_pool = [fake.email() for _ in range(pool_size)]
+    date_pool = [fake.date_between(start_date='-5y', end_date='today').isoformat()
+                 for _ in range(pool_size)]
+
+    # Draw the numeric/categorical columns as whole arrays up front -
+    # one vectorized call each instead of per-row random.* calls
+    ages = np.random.randint(22, 66, count)
+    salaries = np.random.randint(40000, 150001, count)
+    city_idx = np.random.randint(0, len(cities), count)
+    dept_idx = np.random.randint(0, len(departments), count)
+    name_idx = np.random.randint(0, pool_size, count)
+    email_idx = np.random.randint(0, pool_size, count)
+    date_idx = np.random.randint(0, pool_size, count)
+    active = np.random.randint(0, 2, count)
+
+    # Values are stringified once here; Redis stores hash fields as
+    # strings anyway, and this saves redis-py an int re-encode per
+    # field per user during the bulk insert
+    users = []
     for i in range(count):
         user = {
-            "id": i + 1,
-            "name": fake.name(),
-            "email": fake.email(),
-            "age": random.randint(22, 65),
-            "city": random.choice(cities),
-            "department": random.choice(departments),
-            "salary": random.randint(40000, 150000),
-            "join_date": fake.date_between(start_date='-5y', end_date='today').isoformat(),
-            "active": str(random.choice([True, False]))
+            "id": str(i + 1),
+            "name": name_pool[name_idx[i]],
+            "email": email_pool[email_idx[i]],
+            "age": str(ages[i]),
+            "city": cities[city_idx[i]],
+            "department": departments[dept_idx[i]],
+            "salary": str(salaries[i]),
+            "join_date": date_pool[date_idx[i]],
+            "active": str(bool(active[i]))
         }
         users.append(user)
     return users
 
-def bulk_insert_users(r, users, method="pipeline"):
+def bulk_insert_users(r, users, method="pipeline", batch_size=500):
     """Bulk insert users using different methods"""
     print(f"\n📦 Bulk Inserting {len(users)} users using {method}...")
-    
+
     start_time = time.time()
-    
+
     if method == "pipeline":
-        # Using pipeline for batch operations
-        pipe = r.pipeline()
-        for user in users:
-            user_key = f"user:{user['id']}"
-            # Store as hash
-            pipe.hset(user_key, mapping=user)
-            # Add to city index
-            pipe.sadd(f"city:{user['city']}:users", user['id'])
-            # Add to department index
-            pipe.sadd(f"dept:{user['department']}:users", user['id'])
-            # Add to salary sorted set
-            pipe.zadd("users_by_salary", {user['id']: user['salary']})
-            # Add to age sorted set
-            pipe.zadd("users_by_age", {user['id']: user['age']})
-        
+        # Using pipeline for batch operations, flushed every batch_size users
+        # so client memory stays O(batch) and transmit overlaps execution
+        for start in range(0, len(users), batch_size):
+            # transaction=False skips the MULTI/EXEC wrapper - the demo
+            # never looks at the replies, so pay as little for them as
+            # redis-py allows
+            pipe = r.pipeline(transaction=False)
+            salary_map = {}
+            age_map = {}
+            city_ids = defaultdict(list)
+            dept_ids = defaultdict(list)
+
+            for user in users[start:start + batch_size]:
+                # Store as hash
+                pipe.hset(f"user:{user['id']}", mapping=user)
+                # Accumulate index members; one multi-member command per
+                # key per batch instead of one command per user
+                city_ids[user['city']].append(user['id'])
+                dept_ids[user['department']].append(user['id'])
+                salary_map[user['id']] = user['salary']
+                age_map[user['id']] = user['age']
+
+            for city, ids in city_ids.items():
+                pipe.sadd(f"city:{city}:users", *ids)
+            for dept, ids in dept_ids.items():
+                pipe.sadd(f"dept:{dept}:users", *ids)
+                # Keep running department counts so stats are a single
+                # HGETALL instead of one SCARD per department
+                pipe.hincrby("dept_counts", dept, len(ids))
+            pipe.zadd("users_by_salary", salary_map)
+            pipe.zadd("users_by_age", age_map)
+            pipe.execute()
+
+    elif method == "lua":
+        # Server-side Lua via EVALSHA - one cached script call per user
+        insert_user = r.register_script(USER_INSERT_LUA)
+        pipe = r.pipeline(transaction=False)
+        for i, user in enumerate(users, 1):
+            field_args = [item for pair in user.items() for item in pair]
+            insert_user(
+                keys=[f"user:{user['id']}",
+                      f"city:{user['city']}:users",
+                      f"dept:{user['department']}:users",
+                      "users_by_salary",
+                      "users_by_age",
+                      "dept_counts"],
+                args=[user['id'], user['salary'], user['age'], user['department']] + field_args,
+                client=pipe
+            )
+            # Flush every batch_size users to keep the reply buffer bounded
+            if i % batch_size == 0:
+                pipe.execute()
+                pipe = r.pipeline(transaction=False)
         pipe.execute()
-        
+
     elif method == "individual":
         # Individual operations (slower)
         for user in users:
@@ -77,6 +156,7 @@ def bulk_insert_users(r, users, method="pipeline"):
             r.sadd(f"dept:{user['department']}:users", user['id'])
             r.zadd("users_by_salary", {user['id']: user['salary']})
             r.zadd("users_by_age", {user['id']: user['age']})
+            r.hincrby("dept_counts", user['department'], 1)
     
     end_time = time.time()
     duration = end_time - start_time
@@ -107,8 +187,12 @@ def query_performance_tests(r):
     top_earners = r.zrevrange("users_by_salary", 0, 9, withscores=True)
     duration = time.time() - start
     print(f"3. Top 10 earners query: {duration*1000:.2f}ms")
-    for i, (user_id, salary) in enumerate(top_earners[:3], 1):
-        name = r.hget(f"user:{user_id}", "name")
+    # Fetch the names in one pipelined round trip instead of one RTT each
+    pipe = r.pipeline()
+    for user_id, _ in top_earners[:3]:
+        pipe.hget(f"user:{user_id}", "name")
+    names = pipe.execute()
+    for i, ((user_id, salary), name) in enumerate(zip(top_earners[:3], names), 1):
         print(f"   {i}. {name}: ${int(salary):,}")
     
     # Test 4: Age range query
@@ -117,15 +201,10 @@ def query_performance_tests(r):
     duration = time.time() - start
     print(f"4. Users aged 25-35: {len(young_professionals)} users in {duration*1000:.2f}ms")
     
-    # Test 5: Department statistics
+    # Test 5: Department statistics - counts are maintained at insert
+    # time, so this is one HGETALL instead of one SCARD per department
     start = time.time()
-    dept_stats = {}
-    departments = ["Engineering", "Sales", "Marketing", "HR", "Finance", "Operations", "Support"]
-    
-    for dept in departments:
-        count = r.scard(f"dept:{dept}:users")
-        dept_stats[dept] = count
-    
+    dept_stats = r.hgetall("dept_counts")
     duration = time.time() - start
     print(f"5. Department statistics: {duration*1000:.2f}ms")
     for dept, count in dept_stats.items():
@@ -135,36 +214,43 @@ def pattern_matching_queries(r):
     """Demonstrate pattern matching and complex queries"""
     print("\n🎯 Pattern Matching & Complex Queries:")
     
-    # Find all user keys
+    # Find all user keys (SCAN instead of KEYS so the server stays responsive)
     start = time.time()
-    user_keys = r.keys("user:*")
+    user_keys = list(r.scan_iter(match="user:*", count=5000))
     duration = time.time() - start
     print(f"1. Pattern matching (user:*): {len(user_keys)} keys in {duration*1000:.2f}ms")
-    
+
     # Find all city indexes
-    city_keys = r.keys("city:*:users")
+    city_keys = list(r.scan_iter(match="city:*:users", count=5000))
     cities = [key.split(":")[1] for key in city_keys]
     print(f"2. Cities with users: {cities}")
     
     # Complex query: High earners in specific city
+    # Intersect server-side so only the final result crosses the network
     start = time.time()
-    # Get users in San Francisco
-    sf_users = r.smembers("city:San Francisco:users")
-    # Get high earners (top 20%)
     total_users = r.zcard("users_by_salary")
     high_earner_threshold = int(total_users * 0.8)
-    high_earners = r.zrevrange("users_by_salary", 0, high_earner_threshold)
-    
-    # Find intersection
-    sf_high_earners = set(sf_users).intersection(set(high_earners))
+
+    pipe = r.pipeline()
+    # Store the high earners in a temporary zset
+    pipe.zrangestore("_tmp:top_earners", "users_by_salary", 0, high_earner_threshold, desc=True)
+    # Intersect with the city set (sets count as zsets with score 0)
+    pipe.zinterstore("_tmp:sf_high_earners", {"_tmp:top_earners": 1, "city:San Francisco:users": 0})
+    pipe.zrange("_tmp:sf_high_earners", 0, -1)
+    pipe.delete("_tmp:top_earners", "_tmp:sf_high_earners")
+    sf_high_earners = pipe.execute()[2]
     duration = time.time() - start
     
     print(f"3. High earners in San Francisco: {len(sf_high_earners)} users in {duration*1000:.2f}ms")
     
-    # Show details for a few
-    for user_id in list(sf_high_earners)[:3]:
-        user = r.hgetall(f"user:{user_id}")
-        salary = r.zscore("users_by_salary", user_id)
+    # Show details for a few - all lookups in one pipelined round trip
+    sample_ids = list(sf_high_earners)[:3]
+    pipe = r.pipeline()
+    for user_id in sample_ids:
+        pipe.hgetall(f"user:{user_id}")
+        pipe.zscore("users_by_salary", user_id)
+    replies = pipe.execute()
+    for user, salary in zip(replies[::2], replies[1::2]):
         print(f"   {user['name']}: ${int(salary):,} ({user['department']})")
 
 def memory_and_stats(r):
@@ -182,11 +268,13 @@ def memory_and_stats(r):
     print(f"Used memory: {memory_info['used_memory_human']}")
     print(f"Peak memory: {memory_info['used_memory_peak_human']}")
     
-    # Key statistics by type
-    key_types = {}
-    sample_keys = r.keys("*")[:100]  # Sample for performance
+    # Key statistics by type - one pipelined round trip for the sample
+    sample_keys = list(itertools.islice(r.scan_iter(count=100), 100))  # Sample for performance
+    pipe = r.pipeline()
     for key in sample_keys:
-        key_type = r.type(key)
+        pipe.type(key)
+    key_types = {}
+    for key_type in pipe.execute():
         key_types[key_type] = key_types.get(key_type, 0) + 1
     
     print("Key types (sample):")
@@ -197,15 +285,17 @@ def cleanup_demo_data(r):
     """Clean up demo data"""
     print("\n🧹 Cleaning up demo data...")
     
-    # Delete all user-related keys
+    # Delete all user-related keys - SCAN avoids blocking the server on big keyspaces
     keys_to_delete = []
-    keys_to_delete.extend(r.keys("user:*"))
-    keys_to_delete.extend(r.keys("city:*"))
-    keys_to_delete.extend(r.keys("dept:*"))
-    keys_to_delete.extend(r.keys("users_by_*"))
-    
+    for pattern in ("user:*", "city:*", "dept:*", "users_by_*"):
+        keys_to_delete.extend(r.scan_iter(match=pattern, count=5000))
+    keys_to_delete.append("dept_counts")
+
     if keys_to_delete:
-        deleted = r.delete(*keys_to_delete)
+        pipe = r.pipeline()
+        for i in range(0, len(keys_to_delete), 500):
+            pipe.delete(*keys_to_delete[i:i + 500])
+        deleted = sum(pipe.execute())
         print(f"Deleted {deleted} keys")
     else:
         print("No demo data found to delete")
@@ -6,18 +6,22 @@ Shows hashes, lists, sets, sorted sets with real-world examples
 
 import redis
 import json
+import time
 from datetime import datetime
 
-def connect_to_redis():
-    """Connect to Redis server"""
-    try:
-        r = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-        r.ping()
-        print("✅ Connected to Redis successfully!")
-        return r
-    except redis.ConnectionError:
-        print("❌ Could not connect to Redis. Make sure it's running on localhost:6379")
-        return None
+from redis_client import get_client
+
+def connect_to_redis(verify=False):
+    """Get a pooled Redis client; verify=True forces an upfront PING"""
+    r = get_client()
+    if verify:
+        try:
+            r.ping()
+            print("✅ Connected to Redis successfully!")
+        except redis.ConnectionError:
+            print("❌ Could not connect to Redis. Make sure it's running on localhost:6379")
+            return None
+    return r
 
 def hash_operations(r):
     """Demonstrate Redis Hash operations - perfect for objects"""
@@ -30,20 +34,23 @@ def hash_operations(r):
         {"id": "user:1003", "name": "Carol Davis", "email": "carol@example.com", "age": "42", "city": "Chicago"}
     ]
     
+    # Write all three profiles in one pipelined round trip; build the
+    # mapping without mutating the source dict so it stays reusable
+    pipe = r.pipeline(transaction=False)
     for user in users:
-        user_id = user.pop("id")
-        r.hset(user_id, mapping=user)
-    
-    # Retrieve hash data
-    alice = r.hgetall("user:1001")
+        mapping = {k: v for k, v in user.items() if k != "id"}
+        pipe.hset(user["id"], mapping=mapping)
+    pipe.execute()
+
+    # Read them back in a second round trip
+    pipe = r.pipeline(transaction=False)
+    pipe.hgetall("user:1001")
+    pipe.hget("user:1002", "email")
+    pipe.hmget("user:1003", "name", "city", "age")
+    alice, bob_email, carol_info = pipe.execute()
+
     print(f"Alice's profile: {alice}")
-    
-    # Get specific field
-    bob_email = r.hget("user:1002", "email")
     print(f"Bob's email: {bob_email}")
-    
-    # Get multiple fields
-    carol_info = r.hmget("user:1003", "name", "city", "age")
     print(f"Carol's info (name, city, age): {carol_info}")
 
 def list_operations(r):
@@ -59,37 +66,53 @@ def list_operations(r):
         "User logged out"
     ]
     
-    # Add activities to feed (most recent first)
-    for activity in activities:
-        r.lpush("activity_feed", f"{datetime.now().strftime('%H:%M:%S')} - {activity}")
-    
-    # Get recent activities
-    recent = r.lrange("activity_feed", 0, 2)
+    # Add activities to feed (most recent first) - one variadic LPUSH.
+    # Store a raw nanosecond timestamp and keep strftime off the write
+    # path; only the entries we actually display get formatted
+    ts = time.time_ns()
+    r.lpush("activity_feed", *[f"{ts}|{activity}" for activity in activities])
+
+    # Get recent activities, formatting timestamps at read time
+    recent = []
+    for entry in r.lrange("activity_feed", 0, 2):
+        raw_ts, activity = entry.split("|", 1)
+        when = datetime.fromtimestamp(int(raw_ts) / 1e9).strftime('%H:%M:%S')
+        recent.append(f"{when} - {activity}")
     print(f"Recent activities: {recent}")
     
-    # Task queue demonstration
+    # Task queue demonstration - enqueue all tasks in one RPUSH
     tasks = ["process_payment", "send_email", "generate_report", "backup_data"]
-    for task in tasks:
-        r.rpush("task_queue", task)
+    r.rpush("task_queue", *tasks)
     
-    # Process tasks (FIFO)
+    # Process tasks (FIFO) - one counted LPOP (Redis >= 6.2) instead of
+    # an LLEN + LPOP round trip per task
     print("Processing tasks:")
-    while r.llen("task_queue") > 0:
-        task = r.lpop("task_queue")
+    pending = r.lpop("task_queue", r.llen("task_queue")) or []
+    for task in pending:
         print(f"  Processing: {task}")
 
 def set_operations(r):
     """Demonstrate Redis Set operations - unique collections, tags"""
     print("\n🎯 Set Operations (Tags & Unique Collections):")
     
-    # Product tags
-    r.sadd("product:123:tags", "electronics", "smartphone", "android", "budget")
-    r.sadd("product:124:tags", "electronics", "smartphone", "ios", "premium")
-    r.sadd("product:125:tags", "electronics", "laptop", "gaming", "premium")
-    
-    # User interests
-    r.sadd("user:1001:interests", "electronics", "gaming", "photography")
-    r.sadd("user:1002:interests", "electronics", "smartphone", "music")
+    # Product tags and user interests - all index writes queued on one
+    # pipeline and flushed in a single round trip
+    pipe = r.pipeline(transaction=False)
+    pipe.sadd("product:123:tags", "electronics", "smartphone", "android", "budget")
+    pipe.sadd("product:124:tags", "electronics", "smartphone", "ios", "premium")
+    pipe.sadd("product:125:tags", "electronics", "laptop", "gaming", "premium")
+
+    # User interests, plus an inverse index per interest so "who likes X"
+    # never has to scan every user's set
+    user_interests = {
+        "1001": ["electronics", "gaming", "photography"],
+        "1002": ["electronics", "smartphone", "music"]
+    }
+    for user_id, interests in user_interests.items():
+        pipe.sadd(f"user:{user_id}:interests", *interests)
+        for interest in interests:
+            pipe.sadd(f"interest:{interest}:users", user_id)
+    pipe.execute()
     
     # Get all tags for a product
     tags_123 = r.smembers("product:123:tags")
@@ -99,12 +122,8 @@ def set_operations(r):
     common_tags = r.sinter("product:123:tags", "product:124:tags")
     print(f"Common tags between products 123 & 124: {common_tags}")
     
-    # Find users interested in electronics
-    electronics_users = []
-    for user_key in r.keys("user:*:interests"):
-        if r.sismember(user_key, "electronics"):
-            user_id = user_key.split(":")[1]
-            electronics_users.append(user_id)
+    # Find users interested in electronics - one read of the inverse index
+    electronics_users = sorted(r.smembers("interest:electronics:users"))
     print(f"Users interested in electronics: {electronics_users}")
 
 def sorted_set_operations(r):
@@ -121,17 +140,18 @@ def sorted_set_operations(r):
         ("Frank", 2100)
     ]
     
-    for player, score in players:
-        r.zadd("game_leaderboard", {player: score})
-    
-    # Get top players
-    top_players = r.zrevrange("game_leaderboard", 0, 2, withscores=True)
+    # Load the whole leaderboard with one multi-member ZADD
+    r.zadd("game_leaderboard", dict(players))
+
+    # Fetch top players and Alice's rank in one pipelined round trip
+    pipe = r.pipeline(transaction=False)
+    pipe.zrevrange("game_leaderboard", 0, 2, withscores=True)
+    pipe.zrevrank("game_leaderboard", "Alice")
+    top_players, alice_rank = pipe.execute()
+
     print("Top 3 players:")
     for i, (player, score) in enumerate(top_players, 1):
         print(f"  {i}. {player}: {int(score)} points")
-    
-    # Get player rank
-    alice_rank = r.zrevrank("game_leaderboard", "Alice")
     print(f"Alice's rank: #{alice_rank + 1}")
     
     # Product popularity (views as score)
@@ -143,9 +163,8 @@ def sorted_set_operations(r):
         ("product:127", 1500)
     ]
     
-    for product, views in products:
-        r.zadd("popular_products", {product: views})
-    
+    r.zadd("popular_products", dict(products))
+
     # Most popular products
     popular = r.zrevrange("popular_products", 0, 2, withscores=True)
     print("\nMost popular products:")
@@ -5,43 +5,110 @@ Demonstrates real-world Redis usage in e-commerce platforms
 """
 
 import redis
-import json
+import orjson
 import time
+from collections import defaultdict
 from datetime import datetime, timedelta
 from faker import Faker
 import random
 
+from redis_client import get_client
+
 fake = Faker()
 
-def connect_to_redis():
-    """Connect to Redis server"""
-    try:
-        r = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-        r.ping()
-        print("✅ Connected to Redis successfully!")
-        return r
-    except redis.ConnectionError:
-        print("❌ Could not connect to Redis. Make sure it's running on localhost:6379")
-        return None
+# Atomic inventory check-and-decrement: only decrements when enough
+# stock is available, returning (ok, remaining_stock)
+INVENTORY_DECR_LUA = """
+local key = KEYS[1]
+local quantity = tonumber(ARGV[1])
+local current_stock = tonumber(redis.call('GET', key) or 0)
+
+if current_stock >= quantity then
+    redis.call('DECRBY', key, quantity)
+    return {1, current_stock - quantity}
+else
+    return {0, current_stock}
+end
+"""
+
+# Fixed-window counter: INCR, setting the TTL only when the key is new.
+# One atomic call instead of INCR + EXPIRE, and the window no longer
+# stretches every time the counter is hit
+RATE_LIMIT_LUA = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return count
+"""
+
+# Purchase-window counter with fraud detection folded in: bumps the
+# window like RATE_LIMIT_LUA and flags the user in KEYS[2] when the
+# count passes the threshold (ARGV[2]) - detection and alerting are a
+# single atomic call
+FRAUD_WINDOW_LUA = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+if count > tonumber(ARGV[2]) then
+    redis.call('SADD', KEYS[2], ARGV[3])
+end
+return count
+"""
+
+# Scans the given inventory keys server-side and records any product
+# below the threshold (ARGV[1]) in the low_stock_alerts sorted set -
+# one atomic call instead of a GET per product plus ZADDs
+LOW_STOCK_SCAN_LUA = """
+local threshold = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local stock = tonumber(redis.call('GET', key) or 0)
+    if stock < threshold then
+        redis.call('ZADD', 'low_stock_alerts', stock, ARGV[i + 1])
+    end
+end
+return redis.call('ZCARD', 'low_stock_alerts')
+"""
+
+def connect_to_redis(verify=False):
+    """Get a pooled Redis client; verify=True forces an upfront PING"""
+    r = get_client()
+    if verify:
+        try:
+            r.ping()
+            print("✅ Connected to Redis successfully!")
+        except redis.ConnectionError:
+            print("❌ Could not connect to Redis. Make sure it's running on localhost:6379")
+            return None
+    return r
+
+def hset_ex(r, key, mapping, ttl):
+    """Write a hash and set its TTL in one pipelined round trip"""
+    pipe = r.pipeline(transaction=False)
+    pipe.hset(key, mapping=mapping)
+    pipe.expire(key, ttl)
+    pipe.execute()
 
 def session_management(r):
     """1. SESSION MANAGEMENT - User sessions, shopping carts"""
     print("\n🛒 1. SESSION MANAGEMENT (Shopping Cart & User Sessions)")
     
-    # User session data
+    # User session data - one timestamp for both fields, so they agree
+    # on the same logical "now"
     session_id = "sess_abc123def456"
+    now_iso = datetime.now().isoformat()
     user_data = {
         "user_id": "12345",
         "username": "john_doe",
         "email": "john@example.com",
-        "login_time": datetime.now().isoformat(),
-        "last_activity": datetime.now().isoformat(),
-        "preferences": json.dumps({"theme": "dark", "language": "en"})
+        "login_time": now_iso,
+        "last_activity": now_iso,
+        "preferences": orjson.dumps({"theme": "dark", "language": "en"}).decode()
     }
     
     # Store session with 30 minutes expiry
-    r.hset(f"session:{session_id}", mapping=user_data)
-    r.expire(f"session:{session_id}", 1800)  # 30 minutes
+    hset_ex(r, f"session:{session_id}", user_data, 1800)  # 30 minutes
     
     # Shopping cart - stores product IDs and quantities
     cart_items = {
@@ -49,8 +116,7 @@ def session_management(r):
         "product_456": "1",  # 1 unit of product 456
         "product_789": "3"   # 3 units of product 789
     }
-    r.hset(f"cart:{session_id}", mapping=cart_items)
-    r.expire(f"cart:{session_id}", 86400)  # 24 hours
+    hset_ex(r, f"cart:{session_id}", cart_items, 86400)  # 24 hours
     
     print(f"Session stored: {r.hgetall(f'session:{session_id}')}")
     print(f"Cart items: {r.hgetall(f'cart:{session_id}')}")
@@ -72,8 +138,9 @@ def caching_layer(r):
         "reviews_count": 1250
     }
     
-    # Cache product for 1 hour
-    r.setex(f"product:PROD_123", 3600, json.dumps(product_data))
+    # Cache product for 1 hour - stored as a hash so single fields can
+    # be read or updated without parsing the whole JSON blob
+    hset_ex(r, "product:PROD_123", {k: str(v) for k, v in product_data.items()}, 3600)
     
     # Search results cache
     search_results = {
@@ -85,13 +152,13 @@ def caching_layer(r):
     }
     
     # Cache search results for 15 minutes
-    r.setex("search:iphone:page:1", 900, json.dumps(search_results))
+    r.setex("search:iphone:page:1", 900, orjson.dumps(search_results).decode())
     
     # API response cache (e.g., payment gateway response)
     api_response = {"status": "success", "payment_methods": ["card", "paypal", "apple_pay"]}
-    r.setex("api:payment_methods:v1", 7200, json.dumps(api_response))
+    r.setex("api:payment_methods:v1", 7200, orjson.dumps(api_response).decode())
     
-    print(f"Cached product: {json.loads(r.get('product:PROD_123'))['name']}")
+    print(f"Cached product: {r.hget('product:PROD_123', 'name')}")
     print(f"Search cache TTL: {r.ttl('search:iphone:page:1')} seconds")
 
 def real_time_inventory(r):
@@ -101,46 +168,37 @@ def real_time_inventory(r):
     # Product inventory tracking
     products = ["PROD_123", "PROD_456", "PROD_789", "PROD_101", "PROD_202"]
     
+    # Seed all product stocks in one pipelined round trip
+    pipe = r.pipeline(transaction=False)
     for product_id in products:
-        initial_stock = random.randint(10, 100)
-        r.set(f"inventory:{product_id}", initial_stock)
-    
-    # Simulate real-time stock updates
+        pipe.set(f"inventory:{product_id}", random.randint(10, 100))
+    pipe.execute()
+
+    # Simulate real-time stock updates - one MGET for the sample
     print("Initial inventory:")
-    for product_id in products[:3]:
-        stock = r.get(f"inventory:{product_id}")
+    stocks = r.mget([f"inventory:{pid}" for pid in products[:3]])
+    for product_id, stock in zip(products[:3], stocks):
         print(f"  {product_id}: {stock} units")
     
     # Simulate purchase - atomic decrement
     product_to_buy = "PROD_123"
     quantity = 3
     
-    # Use Lua script for atomic inventory check and decrement
-    lua_script = """
-    local key = KEYS[1]
-    local quantity = tonumber(ARGV[1])
-    local current_stock = tonumber(redis.call('GET', key) or 0)
-    
-    if current_stock >= quantity then
-        redis.call('DECRBY', key, quantity)
-        return {1, current_stock - quantity}
-    else
-        return {0, current_stock}
-    end
-    """
-    
-    result = r.eval(lua_script, 1, f"inventory:{product_to_buy}", quantity)
+    # Atomic check-and-decrement via a registered script - redis-py
+    # sends EVALSHA (falling back to EVAL once) so repeat purchases ship
+    # only the 40-byte SHA instead of the whole script source
+    inventory_decr = r.register_script(INVENTORY_DECR_LUA)
+    result = inventory_decr(keys=[f"inventory:{product_to_buy}"], args=[quantity])
     if result[0] == 1:
         print(f"✅ Purchase successful! {product_to_buy}: {result[1]} units remaining")
     else:
         print(f"❌ Insufficient stock! Only {result[1]} units available")
     
-    # Low stock alerts using sorted sets
-    for product_id in products:
-        stock = int(r.get(f"inventory:{product_id}"))
-        if stock < 20:
-            r.zadd("low_stock_alerts", {product_id: stock})
-    
+    # Low stock alerts using sorted sets - the scan/filter/ZADD runs as
+    # one cached server-side script over an atomic snapshot
+    low_stock_scan = r.register_script(LOW_STOCK_SCAN_LUA)
+    low_stock_scan(keys=[f"inventory:{pid}" for pid in products], args=[20] + products)
+
     low_stock = r.zrange("low_stock_alerts", 0, -1, withscores=True)
     if low_stock:
         print("⚠️  Low stock alerts:")
@@ -154,30 +212,34 @@ def recommendations_and_analytics(r):
     # User behavior tracking
     user_id = "user_12345"
     
+    # The whole seed phase only matters for its side effects, so queue
+    # it on one transaction-free pipeline and discard the replies
+    pipe = r.pipeline(transaction=False)
+
     # Recently viewed products (List - FIFO with max length)
+    # One variadic LPUSH and a single final LTRIM instead of a push+trim
+    # pair per product
     recently_viewed = ["PROD_123", "PROD_456", "PROD_789", "PROD_101"]
-    for product in recently_viewed:
-        r.lpush(f"recent_views:{user_id}", product)
-        r.ltrim(f"recent_views:{user_id}", 0, 9)  # Keep only last 10 items
-    
+    pipe.lpush(f"recent_views:{user_id}", *recently_viewed)
+    pipe.ltrim(f"recent_views:{user_id}", 0, 9)  # Keep only last 10 items
+
     # User interests/categories (Set for unique values)
     interests = ["Electronics", "Books", "Clothing", "Sports"]
-    for interest in interests:
-        r.sadd(f"interests:{user_id}", interest)
-    
-    # Product popularity tracking (Sorted Set)
+    pipe.sadd(f"interests:{user_id}", *interests)
+
+    # Product popularity tracking (Sorted Set) - one multi-member ZADD
     popular_products = [
         ("PROD_123", 1500), ("PROD_456", 1200), ("PROD_789", 900),
         ("PROD_101", 800), ("PROD_202", 600)
     ]
-    for product, views in popular_products:
-        r.zadd("popular_products", {product: views})
-    
+    pipe.zadd("popular_products", dict(popular_products))
+
     # Collaborative filtering - users who bought this also bought
     # Using sets for fast intersections
-    r.sadd("bought:PROD_123", "user_1", "user_2", "user_3", "user_100")
-    r.sadd("bought:PROD_456", "user_2", "user_3", "user_4", "user_200")
-    
+    pipe.sadd("bought:PROD_123", "user_1", "user_2", "user_3", "user_100")
+    pipe.sadd("bought:PROD_456", "user_2", "user_3", "user_4", "user_200")
+    pipe.execute()
+
     # Find similar users
     similar_users = r.sinter("bought:PROD_123", "bought:PROD_456")
     
@@ -190,15 +252,17 @@ def rate_limiting_and_security(r):
     """5. RATE LIMITING & SECURITY - API throttling, fraud detection"""
     print("\n🔒 5. RATE LIMITING & SECURITY")
     
-    # API rate limiting - sliding window
+    # All three windows below share one atomic INCR+EXPIRE script
+    bump_window = r.register_script(RATE_LIMIT_LUA)
+
+    # API rate limiting - fixed window
     api_key = "api_key_abc123"
     current_minute = int(time.time() / 60)
-    
+
     # Allow 100 requests per minute per API key
     rate_limit_key = f"rate_limit:{api_key}:{current_minute}"
-    current_count = r.incr(rate_limit_key)
-    r.expire(rate_limit_key, 60)  # Expire after 60 seconds
-    
+    current_count = bump_window(keys=[rate_limit_key], args=[60])  # Expire after 60 seconds
+
     if current_count <= 100:
         print(f"✅ API request allowed ({current_count}/100 this minute)")
     else:
@@ -206,8 +270,7 @@ def rate_limiting_and_security(r):
     
     # Failed login attempts tracking
     user_ip = "192.168.1.100"
-    failed_attempts = r.incr(f"failed_login:{user_ip}")
-    r.expire(f"failed_login:{user_ip}", 3600)  # Reset after 1 hour
+    failed_attempts = bump_window(keys=[f"failed_login:{user_ip}"], args=[3600])  # Reset after 1 hour
     
     if failed_attempts >= 5:
         r.setex(f"blocked_ip:{user_ip}", 7200, "blocked")  # Block for 2 hours
@@ -216,13 +279,13 @@ def rate_limiting_and_security(r):
     # Fraud detection - unusual activity patterns
     user_id = "user_12345"
     
-    # Track rapid purchases
+    # Track rapid purchases - the count, TTL and fraud flag all happen
+    # in one atomic script call
+    fraud_check = r.register_script(FRAUD_WINDOW_LUA)
     purchase_key = f"purchases:{user_id}:{int(time.time() / 300)}"  # 5-minute windows
-    purchase_count = r.incr(purchase_key)
-    r.expire(purchase_key, 300)
-    
+    purchase_count = fraud_check(keys=[purchase_key, "fraud_alerts"], args=[300, 10, user_id])
+
     if purchase_count > 10:  # More than 10 purchases in 5 minutes
-        r.sadd("fraud_alerts", user_id)
         print(f"🚨 Fraud alert: User {user_id} made {purchase_count} purchases in 5 minutes")
 
 def real_time_features(r):
@@ -238,18 +301,21 @@ def real_time_features(r):
         "sale_end_time": (datetime.now() + timedelta(hours=2)).isoformat()
     }
     
-    r.hset("flash_sale:current", mapping=flash_sale)
-    r.expire("flash_sale:current", 7200)  # 2 hours
+    hset_ex(r, "flash_sale:current", flash_sale, 7200)  # 2 hours
     
-    # Live inventory updates using pub/sub pattern (simulated with lists)
+    # Live inventory updates as a capped stream - XADD stores the fields
+    # natively (no JSON), MAXLEN keeps it bounded server-side, and
+    # consumers can XREAD or join a consumer group instead of polling
     inventory_updates = [
         {"product": "PROD_123", "stock": 45, "action": "purchase"},
         {"product": "PROD_456", "stock": 78, "action": "restock"},
         {"product": "PROD_789", "stock": 12, "action": "purchase"}
     ]
-    
+
+    pipe = r.pipeline(transaction=False)
     for update in inventory_updates:
-        r.lpush("inventory_updates", json.dumps(update))
+        pipe.xadd("inventory_updates", update, maxlen=10000, approximate=True)
+    pipe.execute()
     
     # User notifications queue
     notifications = [
@@ -258,16 +324,25 @@ def real_time_features(r):
         {"user_id": "user_789", "type": "order_shipped", "message": "Your order has been shipped!"}
     ]
     
+    # Group notifications per user so each queue takes one LPUSH and one
+    # trailing LTRIM, however many messages a user gets
+    per_user = defaultdict(list)
     for notification in notifications:
-        user_id = notification["user_id"]
-        r.lpush(f"notifications:{user_id}", json.dumps(notification))
+        per_user[notification["user_id"]].append(orjson.dumps(notification).decode())
+
+    for user_id, payloads in per_user.items():
+        r.lpush(f"notifications:{user_id}", *payloads)
         r.ltrim(f"notifications:{user_id}", 0, 49)  # Keep only last 50 notifications
     
     # Geographic data for shipping/delivery
     try:
-        r.geoadd("warehouses", (-74.0059, 40.7128, "NYC_WAREHOUSE"))  # New York
-        r.geoadd("warehouses", (-118.2437, 34.0522, "LA_WAREHOUSE"))   # Los Angeles
-        r.geoadd("warehouses", (-87.6298, 41.8781, "CHI_WAREHOUSE"))   # Chicago
+        # GEOADD takes any number of (lon, lat, name) triples - load all
+        # three warehouses in one command
+        r.geoadd("warehouses", (
+            -74.0059, 40.7128, "NYC_WAREHOUSE",   # New York
+            -118.2437, 34.0522, "LA_WAREHOUSE",   # Los Angeles
+            -87.6298, 41.8781, "CHI_WAREHOUSE"    # Chicago
+        ))
     except Exception as e:
         print(f"Geographic data setup failed: {e}")
         # Use simpler approach
@@ -278,13 +353,15 @@ def real_time_features(r):
     # Find nearest warehouse to customer location
     customer_location = (-73.9857, 40.7484)  # Customer in Manhattan
     try:
-        nearest = r.georadius("warehouses", customer_location[0], customer_location[1], 500, "mi", withdist=True, count=1)
+        # GEOSEARCH replaces the deprecated GEORADIUS command path
+        nearest = r.geosearch("warehouses", longitude=customer_location[0], latitude=customer_location[1],
+                              radius=500, unit="mi", withdist=True, count=1, sort="ASC")
     except Exception as e:
         print(f"Geographic search not available: {e}")
         nearest = None
     
     print(f"Flash sale: {r.hget('flash_sale:current', 'product_id')} - ${r.hget('flash_sale:current', 'sale_price')}")
-    print(f"Inventory updates in queue: {r.llen('inventory_updates')}")
+    print(f"Inventory updates in stream: {r.xlen('inventory_updates')}")
     print(f"Notifications for user_123: {r.llen('notifications:user_123')}")
     if nearest:
         print(f"Nearest warehouse: {nearest[0][0]} ({nearest[0][1]:.1f} miles away)")
@@ -300,53 +377,44 @@ def search_and_filters(r):
         "headphones", "wireless headphones", "bluetooth headphones"
     ]
     
-    # Build auto-complete index
-    for term in search_terms:
-        # Add prefixes for auto-complete
-        for i in range(1, len(term) + 1):
-            prefix = term[:i].lower()
-            r.zadd("autocomplete", {f"{prefix}*{term}": 0})
-    
-    # Search for auto-complete suggestions
+    # Build auto-complete index - every term once at score 0, so the
+    # sorted set orders its members lexicographically
+    r.zadd("autocomplete", {term.lower(): 0 for term in search_terms})
+
+    # Prefix search happens server-side with ZRANGEBYLEX: O(log N + k)
+    # instead of shipping the whole index and scanning it in Python
     search_query = "iph"
-    suggestions = []
-    results = r.zrange("autocomplete", 0, -1)
-    for result in results:
-        if result.startswith(search_query.lower()):
-            suggestion = result.split('*')[1]
-            if suggestion not in suggestions:
-                suggestions.append(suggestion)
-            if len(suggestions) >= 5:
-                break
-    
+    suggestions = r.zrangebylex(
+        "autocomplete", f"[{search_query}", f"[{search_query}\xff", start=0, num=5
+    )
+
     print(f"Auto-complete for '{search_query}': {suggestions}")
     
-    # Product filters using sets
+    # Product filters using sets - build all the filter indexes in one
+    # pipelined round trip
+    pipe = r.pipeline(transaction=False)
     # Category filter
-    r.sadd("category:Electronics", "PROD_123", "PROD_456", "PROD_789")
-    r.sadd("category:Books", "PROD_201", "PROD_202", "PROD_203")
-    r.sadd("category:Clothing", "PROD_301", "PROD_302", "PROD_303")
-    
+    pipe.sadd("category:Electronics", "PROD_123", "PROD_456", "PROD_789")
+    pipe.sadd("category:Books", "PROD_201", "PROD_202", "PROD_203")
+    pipe.sadd("category:Clothing", "PROD_301", "PROD_302", "PROD_303")
+
     # Brand filter
-    r.sadd("brand:Apple", "PROD_123", "PROD_124", "PROD_125")
-    r.sadd("brand:Samsung", "PROD_456", "PROD_457", "PROD_458")
-    
+    pipe.sadd("brand:Apple", "PROD_123", "PROD_124", "PROD_125")
+    pipe.sadd("brand:Samsung", "PROD_456", "PROD_457", "PROD_458")
+
     # Price range filter using sorted sets
-    r.zadd("price_range", {"PROD_123": 999, "PROD_456": 799, "PROD_789": 299, "PROD_124": 1199})
+    pipe.zadd("price_range", {"PROD_123": 999, "PROD_456": 799, "PROD_789": 299, "PROD_124": 1199})
+    pipe.execute()
     
     # Complex filter query: Electronics AND Apple AND price between 500-1000
-    electronics_products = r.smembers("category:Electronics")
-    apple_products = r.smembers("brand:Apple")
-    
-    # Find intersection
-    filtered_products = electronics_products.intersection(apple_products)
-    
-    # Apply price filter
-    price_filtered = []
-    for product in filtered_products:
-        price = r.zscore("price_range", product)
-        if price and 500 <= price <= 1000:
-            price_filtered.append(product)
+    # Runs entirely server-side: intersect the two filter sets, overlay
+    # the price zset, then range on score - only the matches come back
+    pipe = r.pipeline(transaction=False)
+    pipe.sinterstore("_tmp:cat_brand", "category:Electronics", "brand:Apple")
+    pipe.zinterstore("_tmp:price_filtered", {"price_range": 1, "_tmp:cat_brand": 0})
+    pipe.zrangebyscore("_tmp:price_filtered", 500, 1000)
+    pipe.delete("_tmp:cat_brand", "_tmp:price_filtered")
+    price_filtered = pipe.execute()[2]
     
     print(f"Filtered products (Electronics + Apple + $500-1000): {price_filtered}")
 
@@ -354,7 +422,11 @@ def analytics_and_reporting(r):
     """8. ANALYTICS & REPORTING - Daily metrics, user behavior"""
     print("\n📊 8. ANALYTICS & REPORTING")
     
+    # Format the dated key names once instead of rebuilding the
+    # f-strings at every call site
     today = datetime.now().strftime("%Y-%m-%d")
+    daily_key = f"daily_metrics:{today}"
+    top_key = f"top_products:{today}"
     
     # Daily metrics
     daily_metrics = {
@@ -365,10 +437,13 @@ def analytics_and_reporting(r):
         "bounce_rate": 0.32
     }
     
+    # One HSET writes the whole metrics hash; the per-metric timeseries
+    # entries flush together on a pipeline
+    r.hset(daily_key, mapping=daily_metrics)
+    pipe = r.pipeline(transaction=False)
     for metric, value in daily_metrics.items():
-        r.hset(f"daily_metrics:{today}", metric, value)
-        # Also add to time series for trending
-        r.zadd(f"timeseries:{metric}", {today: value})
+        pipe.zadd(f"timeseries:{metric}", {today: value})
+    pipe.execute()
     
     # User behavior funnel
     funnel_data = {
@@ -390,12 +465,12 @@ def analytics_and_reporting(r):
         ("PROD_202", 4200.00)
     ]
     
-    for product, revenue in top_products:
-        r.zadd(f"top_products:{today}", {product: revenue})
+    # One multi-member ZADD instead of one call per product
+    r.zadd(top_key, dict(top_products))
     
-    print(f"Daily metrics: {r.hgetall(f'daily_metrics:{today}')}")
+    print(f"Daily metrics: {r.hgetall(daily_key)}")
     print(f"Conversion funnel: {funnel_data['purchase']}/{funnel_data['visitors']} = {(funnel_data['purchase']/funnel_data['visitors']*100):.1f}%")
-    print(f"Top product today: {r.zrevrange(f'top_products:{today}', 0, 0, withscores=True)}")
+    print(f"Top product today: {r.zrevrange(top_key, 0, 0, withscores=True)}")
 
 def main():
     r = connect_to_redis()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Shared Redis connection pool for the demo scripts
+Hands out clients backed by one module-level pool
+"""
+
+import redis
+
+# One pool for the whole process - sockets are reused across clients,
+# so the TCP handshake happens once per connection instead of once per
+# connect_to_redis() call. Keepalive stops idle demo pauses from
+# silently dropping the connection.
+# health_check_interval must be set on the pool (it reaches every
+# connection via connection_kwargs); passing it to Redis() is ignored
+# when a connection_pool is supplied. It revalidates sockets that sat
+# idle for 30s instead of paying an explicit PING on every checkout.
+POOL = redis.ConnectionPool(
+    host='localhost',
+    port=6379,
+    db=0,
+    decode_responses=True,
+    max_connections=16,
+    socket_keepalive=True,
+    health_check_interval=30
+)
+
+def get_client():
+    """Return a Redis client backed by the shared connection pool"""
+    return redis.Redis(connection_pool=POOL)
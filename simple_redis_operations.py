@@ -6,18 +6,21 @@ Shows basic string operations, counters, and expiration
 
 import redis
 import time
-import json
+import orjson
 
-def connect_to_redis():
-    """Connect to Redis server"""
-    try:
-        r = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-        r.ping()
-        print("✅ Connected to Redis successfully!")
-        return r
-    except redis.ConnectionError:
-        print("❌ Could not connect to Redis. Make sure it's running on localhost:6379")
-        return None
+from redis_client import get_client
+
+def connect_to_redis(verify=False):
+    """Get a pooled Redis client; verify=True forces an upfront PING"""
+    r = get_client()
+    if verify:
+        try:
+            r.ping()
+            print("✅ Connected to Redis successfully!")
+        except redis.ConnectionError:
+            print("❌ Could not connect to Redis. Make sure it's running on localhost:6379")
+            return None
+    return r
 
 def simple_string_operations(r):
     """Demonstrate basic string operations"""
@@ -28,9 +31,11 @@ def simple_string_operations(r):
     r.set("user:email", "john@example.com")
     r.set("user:age", 30)
     
-    print(f"Name: {r.get('user:name')}")
-    print(f"Email: {r.get('user:email')}")
-    print(f"Age: {r.get('user:age')}")
+    # One MGET instead of three separate GET round trips
+    name, email, age = r.mget("user:name", "user:email", "user:age")
+    print(f"Name: {name}")
+    print(f"Email: {email}")
+    print(f"Age: {age}")
     
     # String with expiration (TTL)
     r.setex("session:abc123", 60, "user_session_data")
@@ -45,10 +50,12 @@ def counter_operations(r):
     r.set("page_views", 0)
     r.set("user_logins", 0)
     
-    # Increment operations
-    for i in range(5):
-        r.incr("page_views")
-        r.incr("user_logins", 2)  # increment by 2
+    # Increment operations - the ten per-event INCRs collapse into two
+    # INCRBYs flushed in a single pipelined round trip
+    pipe = r.pipeline(transaction=False)
+    pipe.incrby("page_views", 5)
+    pipe.incrby("user_logins", 10)  # 5 increments of 2
+    pipe.execute()
     
     print(f"Page views: {r.get('page_views')}")
     print(f"User logins: {r.get('user_logins')}")
@@ -68,13 +75,20 @@ def json_like_storage(r):
         }
     }
     
-    # Store as JSON string
-    r.set("user:1001", json.dumps(user_data))
-    
-    # Retrieve and parse
-    retrieved = json.loads(r.get("user:1001"))
-    print(f"Retrieved user: {retrieved['name']}")
-    print(f"Theme preference: {retrieved['preferences']['theme']}")
+    # Store as a hash - top-level fields stay individually readable,
+    # only the nested preferences dict is JSON-encoded
+    r.hset("user:1001", mapping={
+        "id": str(user_data["id"]),
+        "name": user_data["name"],
+        "email": user_data["email"],
+        "preferences": orjson.dumps(user_data["preferences"]).decode()
+    })
+
+    # Retrieve only the fields we need - no full-object parse
+    name = r.hget("user:1001", "name")
+    preferences = orjson.loads(r.hget("user:1001", "preferences"))
+    print(f"Retrieved user: {name}")
+    print(f"Theme preference: {preferences['theme']}")
 
 def main():
     r = connect_to_redis()
@@ -90,8 +104,10 @@ def main():
     counter_operations(r)
     json_like_storage(r)
     
-    # Show all keys
-    print(f"\n🔑 All keys in database: {r.keys('*')}")
+    # Show all keys - SCAN cursors through in bounded chunks instead of
+    # the server-blocking KEYS *
+    keys = list(r.scan_iter(match='*', count=500))
+    print(f"\n🔑 All keys in database: {keys}")
     print(f"📊 Total keys: {r.dbsize()}")
 
 if __name__ == "__main__":